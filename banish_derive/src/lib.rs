@@ -5,13 +5,12 @@
 //! This is the macro implementation for the `banish` crate, which provides the public API and user-facing documentation.
 
 use proc_macro;
-use proc_macro2::TokenTree;
 use quote::quote;
 use syn::{
     Expr, Ident, Result, Stmt, Token, braced,
     parse::{Parse, ParseStream}, parse_macro_input,
 };
-use std::collections::HashSet;
+use std::collections::{HashMap, HashSet};
 
 
 //// AST
@@ -73,20 +72,14 @@ impl Parse for Rule {
         let condition: Option<Expr> = if input.peek(syn::token::Brace) {
             None
         } else {
-            let mut cond_tokens = proc_macro2::TokenStream::new();
-            
-            // Loop until we see the start of the body block
-            while !input.peek(syn::token::Brace) {
-                if input.is_empty() {
-                    return Err(input.error("Unexpected end of input, expected rule body '{'"));
-                }
-                // Pull one token at a time (e.g., "buffer", "[", "idx", "]", "==", "target")
-                cond_tokens.extend(std::iter::once(input.parse::<TokenTree>()?));
+            // Parse the condition the way rustc parses an `if` condition, in a single pass.
+            // Struct literals aren't allowed here, so syn can't mistake the body's '{' for one!
+            let condition: Expr = Expr::parse_without_eager_brace(input)?;
+            if !input.peek(syn::token::Brace) {
+                return Err(input.error("expected rule body '{' after condition"));
             }
-            
-            // Now parse those isolated tokens as an Expression.
-            // Since the '{' isn't in 'cond_tokens', syn can't mistake it for a struct!
-            Some(syn::parse2(cond_tokens)?)
+
+            Some(condition)
         };
 
         let content: syn::parse::ParseBuffer<'_>;
@@ -123,15 +116,44 @@ impl Parse for Rule {
 pub fn banish(input: proc_macro::TokenStream) -> proc_macro::TokenStream {
     let input: Context = parse_macro_input!(input as Context);
 
-    if let Err(err) = validate_state_and_rule_names(&input) {
-        return err.to_compile_error().into();
-    }
+    // Validation also resolves state names to their indices, so transitions don't rescan the state list
+    let state_indices: HashMap<String, usize> = match validate_state_and_rule_names(&input) {
+        Ok(state_indices) => state_indices,
+        Err(err) => return err.to_compile_error().into(),
+    };
 
     let state_blocks = input.states.iter().enumerate().map(|(index, state)| {
+        let index: syn::Index = syn::Index::from(index);
+
+        // A state with only conditionless rules can never retrigger, so it needs just one pass.
+        // The loop is kept so 'break' and 'continue' in rule bodies still target the state.
+        if state.rules.iter().all(|rule| rule.condition.is_none()) {
+            let rules = state.rules.iter().map(|func| {
+                let body = func.body.iter().map(|stmt| generate_stmt(stmt, &state_indices));
+                quote! {
+                    {
+                        #(#body)*
+                    }
+                }
+            });
+
+            return quote! {
+                #index => {
+                    loop {
+                        #(#rules)*
+                        #[allow(unreachable_code)]
+                        break;
+                    }
+
+                    __current_state += 1;
+                }
+            };
+        }
+
         let rules = state.rules.iter().map(|func| {
-            let body = func.body.iter().map(|stmt| generate_stmt(stmt, &input));
+            let body = func.body.iter().map(|stmt| generate_stmt(stmt, &state_indices));
             let else_body = func.else_body.as_ref().map(|else_block| {
-                else_block.iter().map(|stmt| generate_stmt(stmt, &input))
+                else_block.iter().map(|stmt| generate_stmt(stmt, &state_indices))
             });
 
             // If a rule has a condition, we want to run it every iteration until the condition is false.
@@ -165,16 +187,26 @@ pub fn banish(input: proc_macro::TokenStream) -> proc_macro::TokenStream {
             }
         });
 
+        // Only conditionless rules read the first iteration flag, so don't track it otherwise
+        let has_conditionless: bool = state.rules.iter().any(|rule| rule.condition.is_none());
+        let (first_iteration_init, first_iteration_update) = if has_conditionless {
+            (
+                quote! { let mut __first_iteration = true; },
+                quote! { __first_iteration = false; },
+            )
+        } else {
+            (quote! {}, quote! {})
+        };
+
         // State loop
         // If no interactions occur in a full pass, exit state
-        let index: syn::Index = syn::Index::from(index);
         quote! {
             #index => {
-                let mut __first_iteration = true;
+                #first_iteration_init
                 loop {
-                    __interaction = false;
+                    let mut __interaction: bool = false;
                     #(#rules)*
-                    if __first_iteration { __first_iteration = false; }
+                    #first_iteration_update
                     if !__interaction {
                         break;
                     }
@@ -188,7 +220,6 @@ pub fn banish(input: proc_macro::TokenStream) -> proc_macro::TokenStream {
     let expanded: proc_macro2::TokenStream = quote! {{
         (move || {
             let mut __current_state: usize = 0;
-            let mut __interaction: bool = false;
             'banish_main: loop {
                 match __current_state {
                     #(#state_blocks)*
@@ -222,15 +253,12 @@ fn parse_rule_block(content: &syn::parse::ParseBuffer) -> Result<Vec<BanishStmt>
     Ok(body)
 }
 
-fn generate_stmt(stmt: &BanishStmt, input: &Context) -> proc_macro2::TokenStream {
+fn generate_stmt(stmt: &BanishStmt, state_indices: &HashMap<String, usize>) -> proc_macro2::TokenStream {
     match stmt {
         BanishStmt::Rust(stmt) => quote! { #stmt },
         BanishStmt::StateTransition(transition) => {
-            let target: usize = input.states
-                .iter()
-                .position(|state| &state.name == transition)
-                .unwrap_or_else(|| { panic!("Error: Invalid state transition target {}", transition); });
-            
+            // Targets are checked in validate_state_and_rule_names
+            let target: usize = state_indices[&transition.to_string()];
             let target: syn::Index = syn::Index::from(target);
             quote! {
                 __current_state = #target;
@@ -240,32 +268,47 @@ fn generate_stmt(stmt: &BanishStmt, input: &Context) -> proc_macro2::TokenStream
     }
 }
 
-fn validate_state_and_rule_names(input: &Context) -> syn::Result<()> {
-    let mut state_names: HashSet<String> = HashSet::new();
-    for state in &input.states {
-        let name: String = state.name.to_string();
-        if !state_names.insert(name.clone()) {
+// Checks for duplicate state and rule names and unknown transition targets,
+// returning each state's index keyed by name
+fn validate_state_and_rule_names(input: &Context) -> syn::Result<HashMap<String, usize>> {
+    let mut state_indices: HashMap<String, usize> = HashMap::with_capacity(input.states.len());
+    for (index, state) in input.states.iter().enumerate() {
+        if state_indices.insert(state.name.to_string(), index).is_some() {
             return Err(syn::Error::new(
                 state.name.span(),
-                format!("Duplicate state name '{}'", name),
+                format!("Duplicate state name '{}'", state.name),
             ));
         }
 
         let mut rule_names: HashSet<String> = HashSet::new();
         for rule in &state.rules {
-            let name: String = rule.name.to_string();
-
-            if !rule_names.insert(name.clone()) {
+            if !rule_names.insert(rule.name.to_string()) {
                 return Err(syn::Error::new(
                     rule.name.span(),
                     format!(
                         "Duplicate rule '{}' in state '{}'",
-                        name, state.name
+                        rule.name, state.name
                     ),
                 ));
             }
         }
     }
 
-    Ok(())
+    for state in &input.states {
+        for rule in &state.rules {
+            let else_body = rule.else_body.iter().flatten();
+            for stmt in rule.body.iter().chain(else_body) {
+                if let BanishStmt::StateTransition(target) = stmt {
+                    if !state_indices.contains_key(&target.to_string()) {
+                        return Err(syn::Error::new(
+                            target.span(),
+                            format!("Invalid state transition target '{}'", target),
+                        ));
+                    }
+                }
+            }
+        }
+    }
+
+    Ok(state_indices)
 }
\ No newline at end of file